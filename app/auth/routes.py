@@ -1,8 +1,8 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends
-from pydantic import BaseModel, EmailStr, Field
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.service import login_user, register_user, verify_email
 from app.db.session import get_db
@@ -10,26 +10,24 @@ from app.db.session import get_db
 router = APIRouter(tags=["auth"])
 
 
-class SignupRequest(BaseModel):
-    email: EmailStr
-    password: Annotated[str, Field(min_length=8)]
-
+class EmailPasswordCredentials(BaseModel):
+    """Request body shared by signup and login"""
+    model_config = ConfigDict(frozen=True)
 
-class LoginRequest(BaseModel):
     email: EmailStr
     password: Annotated[str, Field(min_length=8)]
 
 
 @router.post("/signup")
-def signup(payload: SignupRequest, db: Session = Depends(get_db)):
-    return register_user(db, payload.email, payload.password)
+async def signup(payload: EmailPasswordCredentials, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+    return await register_user(db, payload.email, payload.password, background_tasks)
 
 
 @router.get("/verify")
-def verify(token: str, db: Session = Depends(get_db)):
-    return verify_email(db, token)
+async def verify(token: str, db: AsyncSession = Depends(get_db)):
+    return await verify_email(db, token)
 
 
 @router.post("/login")
-def login(payload: LoginRequest, db: Session = Depends(get_db)):
-    return login_user(db, payload.email, payload.password)
+async def login(payload: EmailPasswordCredentials, db: AsyncSession = Depends(get_db)):
+    return await login_user(db, payload.email, payload.password)
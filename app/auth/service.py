@@ -1,22 +1,51 @@
+import logging
 import os
 from datetime import datetime, timedelta
 from uuid import UUID
 
-from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import BackgroundTasks, HTTPException, status
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.models import RefreshToken, User
 from app.core.config import get_settings
 from app.core.email import get_email_service
 from app.core.jwt import create_access_token, create_refresh_token
-from app.core.security import generate_otp, hash_password, hash_token, verify_password
-from app.db.mongodb import get_sync_mongodb
+from app.core.security import (
+    BCRYPT_MAX_PASSWORD_BYTES,
+    DUMMY_PASSWORD_HASH,
+    ahash_password,
+    averify_password,
+    generate_otp,
+    hash_token,
+    password_exceeds_scheme_limit,
+)
+from app.db.mongodb import get_mongodb
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+_OTP_LENGTH = settings.OTP_LENGTH
+_OTP_EXPIRE_MIN = settings.OTP_EXPIRE_MINUTES
 REFRESH_EXPIRES_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
 OTP_COLLECTION = "email_otps"
 OTP_PURPOSE_EMAIL = "email_verification"
 
+# Dialect-specific INSERT constructs that support ON CONFLICT
+_UPSERT_INSERTS = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+
+def _normalize_email(email: str) -> str:
+    """
+    Emails are stored lowercased so lookups are a plain `email = :email` match on the unique
+    ix_users_email index. ix_users_email_lower (on lower(email)) cannot serve those lookups;
+    it only enforces case-insensitive uniqueness.
+    """
+    return email.strip().lower()
+
 
 def _serialize_user(user: User) -> dict:
     return {
@@ -27,17 +56,22 @@ def _serialize_user(user: User) -> dict:
     }
 
 
-def _issue_tokens(db: Session, user: User) -> dict:
+async def _issue_tokens(db: AsyncSession, user: User) -> dict:
     access_token = create_access_token(str(user.id), {"email": user.email})
     refresh_token = create_refresh_token(str(user.id), {"email": user.email})
-    token_record = RefreshToken(
-        user_id=user.id,
-        refresh_token_hash=hash_token(refresh_token),
-        expires_at=datetime.utcnow() + timedelta(days=REFRESH_EXPIRES_DAYS),
-        last_used_at=datetime.utcnow(),
+    now = datetime.utcnow()
+    # Plain INSERT ... RETURNING: skips the unit-of-work flush and post-insert refresh
+    await db.execute(
+        insert(RefreshToken)
+        .values(
+            user_id=user.id,
+            refresh_token_hash=hash_token(refresh_token),
+            expires_at=now + timedelta(days=REFRESH_EXPIRES_DAYS),
+            last_used_at=now,
+        )
+        .returning(RefreshToken.id)
     )
-    db.add(token_record)
-    db.commit()
+    await db.commit()
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
@@ -45,18 +79,31 @@ def _issue_tokens(db: Session, user: User) -> dict:
     }
 
 
-def register_user(db: Session, email: str, password: str) -> dict:
-    existing = db.query(User).filter(User.email == email.lower()).first()
-    if existing:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
-
-    user = User(email=email.lower(), password_hash=hash_password(password), email_verified=False)
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+async def register_user(db: AsyncSession, email: str, password: str, background_tasks: BackgroundTasks) -> dict:
+    email = _normalize_email(email)
+    if password_exceeds_scheme_limit(password):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Password must be at most {BCRYPT_MAX_PASSWORD_BYTES} bytes",
+        )
+    password_hash = await ahash_password(password)
+
+    # Single round trip: the unique email constraint settles duplicate (and racing) signups
+    upsert = _UPSERT_INSERTS[db.bind.dialect.name]
+    user = await db.scalar(
+        upsert(User)
+        .values(email=email, password_hash=password_hash, email_verified=False)
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User)
+    )
+    if user is None:
+        user = await _unverified_user_for_resend(db, email, password)
+    else:
+        await db.commit()
 
-    otp_code = _create_email_verification_otp(user)
-    _send_verification_email(user.email, otp_code)
+    otp_code = await _create_email_verification_otp(user)
+    # Respond once the user is persisted; the Brevo round trip happens after the response
+    background_tasks.add_task(_send_verification_email, user.email, otp_code)
 
     return {
         "user": _serialize_user(user),
@@ -64,90 +111,123 @@ def register_user(db: Session, email: str, password: str) -> dict:
     }
 
 
-def verify_email(db: Session, token: str) -> dict:
+async def _unverified_user_for_resend(db: AsyncSession, email: str, password: str) -> User:
+    """
+    Repeating signup with the same credentials on a not-yet-verified account re-issues its
+    verification OTP, so an account whose first email failed can still be verified.
+    Anything else is a duplicate registration.
+    """
+    user = await db.scalar(select(User).where(User.email == email))
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+    # Checked for verified accounts too, so the response time does not reveal verification status
+    password_ok = await averify_password(password, user.password_hash)
+    if not password_ok or user.email_verified:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+    return user
+
+
+async def verify_email(db: AsyncSession, token: str) -> dict:
     otp_code = token.strip()
-    if not otp_code.isdigit() or len(otp_code) != settings.OTP_LENGTH:
+    if not otp_code.isdigit() or len(otp_code) != _OTP_LENGTH:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid OTP code")
 
     collection = _get_otp_collection()
     otp_hash = hash_token(otp_code)
-    record = collection.find_one({"otp_hash": otp_hash, "purpose": OTP_PURPOSE_EMAIL})
+    now = datetime.utcnow()
+    # Atomically claim an unused, unexpired OTP so it can only be redeemed once
+    record = await collection.find_one_and_update(
+        {"otp_hash": otp_hash, "purpose": OTP_PURPOSE_EMAIL, "used": False, "expires_at": {"$gt": now}},
+        {"$set": {"used": True, "used_at": now}},
+        return_document=ReturnDocument.BEFORE,
+    )
     if not record:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Invalid or expired OTP")
 
-    now = datetime.utcnow()
-    if record.get("used"):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="OTP already used")
-    if record.get("expires_at") and record["expires_at"] <= now:
-        collection.update_one({"_id": record["_id"]}, {"$set": {"used": True, "used_at": now}})
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="OTP expired")
-
     try:
         user_id = UUID(str(record.get("user_id")))
     except Exception:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid OTP record")
 
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        collection.update_one({"_id": record["_id"]}, {"$set": {"used": True, "used_at": now}})
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-
-    user.email_verified = True
-    user.email_verified_at = now
-    db.commit()
+    try:
+        result = await db.execute(select(User).where(User.id == user_id))
+        user = result.scalar_one_or_none()
+        if not user:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+        user.email_verified = True
+        user.email_verified_at = now
+        await db.commit()
+    except Exception:
+        # The SQL side failed after the claim: release it so the same code works on retry
+        await _release_otp_claim(collection, record["_id"])
+        raise
 
-    collection.update_one({"_id": record["_id"]}, {"$set": {"used": True, "used_at": now}})
     return _serialize_user(user)
 
 
-def login_user(db: Session, email: str, password: str) -> dict:
-    user = db.query(User).filter(User.email == email.lower()).first()
-    if not user or not verify_password(password, user.password_hash):
+async def login_user(db: AsyncSession, email: str, password: str) -> dict:
+    email = _normalize_email(email)
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalar_one_or_none()
+    # Unknown emails still pay for a full verify so both login failures take the same time
+    password_hash = user.password_hash if user else DUMMY_PASSWORD_HASH
+    if not await averify_password(password, password_hash) or not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     if not user.email_verified:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Email not verified")
 
-    tokens = _issue_tokens(db, user)
+    tokens = await _issue_tokens(db, user)
     return {"user": _serialize_user(user), **tokens}
 
 
 def _get_otp_collection():
+    return get_mongodb()[OTP_COLLECTION]
+
+
+async def _release_otp_claim(collection, record_id) -> None:
     try:
-        db = get_sync_mongodb()
-    except RuntimeError as exc:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"OTP storage unavailable: {exc}")
-    return db[OTP_COLLECTION]
+        await collection.update_one({"_id": record_id}, {"$set": {"used": False, "used_at": None}})
+    except DuplicateKeyError:
+        # A newer unused code was issued meanwhile (repeated signup); that one stays valid
+        pass
+    except Exception:
+        logger.exception("Failed to release OTP claim %s", record_id)
 
 
-def _create_email_verification_otp(user: User) -> str:
+async def _create_email_verification_otp(user: User) -> str:
     collection = _get_otp_collection()
-    otp_code = generate_otp(settings.OTP_LENGTH)
+    otp_code = generate_otp(_OTP_LENGTH)
     otp_hash = hash_token(otp_code)
-    expires_at = datetime.utcnow() + timedelta(minutes=settings.OTP_EXPIRE_MINUTES)
-
-    # Remove any existing unused OTPs for this user/purpose
-    collection.delete_many({"user_id": str(user.id), "purpose": OTP_PURPOSE_EMAIL, "used": False})
-
-    collection.insert_one(
-        {
-            "user_id": str(user.id),
-            "email": user.email,
-            "purpose": OTP_PURPOSE_EMAIL,
-            "otp_hash": otp_hash,
-            "expires_at": expires_at,
-            "created_at": datetime.utcnow(),
-            "used": False,
-            "used_at": None,
-            "attempts": 0,
-        }
-    )
+    now = datetime.utcnow()
+    expires_at = now + timedelta(minutes=_OTP_EXPIRE_MIN)
+
+    otp_filter = {"user_id": str(user.id), "purpose": OTP_PURPOSE_EMAIL, "used": False}
+    otp_doc = {
+        "user_id": str(user.id),
+        "email": user.email,
+        "purpose": OTP_PURPOSE_EMAIL,
+        "otp_hash": otp_hash,
+        "expires_at": expires_at,
+        "created_at": now,
+        "used": False,
+        "used_at": None,
+        "attempts": 0,
+    }
+    # Replace the user's unused OTP (if any) with the new one in a single write
+    try:
+        await collection.replace_one(otp_filter, otp_doc, upsert=True)
+    except DuplicateKeyError:
+        # A concurrent re-issue inserted first; MongoDB won't retry this upsert itself because
+        # the filter ("used") is not the unique index key. Retrying matches and replaces its doc.
+        await collection.replace_one(otp_filter, otp_doc, upsert=True)
 
     return otp_code
 
 
 def _send_verification_email(email: str, otp_code: str) -> None:
-    email_service = get_email_service()
     try:
-        email_service.send_verification_email(email, otp_code)
-    except Exception as exc:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to send verification email") from exc
\ No newline at end of file
+        get_email_service().send_verification_email(email, otp_code)
+    except Exception:
+        # The OTP is already stored and repeating the signup re-issues it; never fail the signup here
+        logger.exception(f"Failed to send verification email to {email}")
\ No newline at end of file
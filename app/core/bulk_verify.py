@@ -0,0 +1,42 @@
+"""
+Bulk legacy password verification - offline jobs only, never the request path
+Hashes are parsed once up front; PBKDF2 then runs across a thread pool, which scales
+across cores because OpenSSL's pbkdf2_hmac releases the GIL
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from app.core.security import parse_pbkdf2_hash, verify_pbkdf2
+
+ParsedHash = Tuple[str, int, bytes, bytes]
+
+
+def _parse_or_none(hashed_password: str) -> Optional[ParsedHash]:
+    if not hashed_password.startswith('pbkdf2:'):
+        return None
+    try:
+        return parse_pbkdf2_hash(hashed_password)
+    except ValueError:
+        return None
+
+
+def _verify_parsed(plain_password: str, parsed: Optional[ParsedHash]) -> bool:
+    if parsed is None:
+        return False
+    try:
+        return verify_pbkdf2(plain_password, *parsed)
+    except ValueError:
+        # Unknown digest name in a stored hash
+        return False
+
+
+def verify_pbkdf2_batch(pairs: Sequence[Tuple[str, str]], max_workers: Optional[int] = None) -> List[bool]:
+    """
+    Verify many (plain_password, legacy_pbkdf2_hash) pairs.
+    Returns one bool per pair, in order; malformed or non-PBKDF2 hashes yield False.
+    """
+    plains = [plain for plain, _ in pairs]
+    parsed = [_parse_or_none(hashed) for _, hashed in pairs]
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        return list(pool.map(_verify_parsed, plains, parsed))
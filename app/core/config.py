@@ -7,8 +7,8 @@ RULES:
 - Development must NEVER crash due to missing external services
 """
 
-from functools import lru_cache
-from typing import List
+from functools import cached_property
+from typing import List, Literal
 
 from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -72,11 +72,23 @@ class Settings(BaseSettings):
     EMAIL_VERIFICATION_EXPIRE_HOURS: int = 24
 
     # ======================
-    # Password Hashing (Argon2)
+    # Password Hashing
     # ======================
+    # Scheme for new hashes; Argon2 hashes always verify
+    PASSWORD_HASH_SCHEME: Literal["argon2", "bcrypt"] = "argon2"
+    PASSWORD_HASH_BCRYPT_ROUNDS: int = 12
+    # Keep verifying bcrypt hashes after switching back to argon2 (implied by scheme=bcrypt).
+    # Every verify then also runs bcrypt, so timing stays uniform across users
+    PASSWORD_HASH_VERIFY_BCRYPT: bool = False
+    # Argon2
     PASSWORD_HASH_TIME_COST: int = 2
     PASSWORD_HASH_MEMORY_COST: int = 65536
-    PASSWORD_HASH_PARALLELISM: int = 1
+    PASSWORD_HASH_PARALLELISM: int = 1  # libsodium always uses 1 lane
+    # Legacy PBKDF2 hashes ('pbkdf2:<algo>:<iterations>$...') verify for existing users during
+    # migration. Every verify also runs PBKDF2 at the legacy hashes' iteration count; opt out
+    # once no such hashes remain
+    LEGACY_PBKDF2_ENABLED: bool = True
+    LEGACY_PBKDF2_ITERATIONS: int = 260000
 
     # ======================
     # Rate Limiting
@@ -117,11 +129,11 @@ class Settings(BaseSettings):
     def normalize_env(cls, value: str) -> str:
         return (value or "development").strip().lower()
 
-    @property
+    @cached_property
     def is_production(self) -> bool:
         return self.ENV == "production"
 
-    @property
+    @cached_property
     def cors_origins_list(self) -> List[str]:
         if self.CORS_ORIGINS == "*":
             return ["*"]
@@ -175,8 +187,9 @@ class Settings(BaseSettings):
 # ======================
 # Settings Loader
 # ======================
-@lru_cache()
+SETTINGS: Settings = Settings()
+SETTINGS.validate_production_settings()
+
+
 def get_settings() -> Settings:
-    settings = Settings()
-    settings.validate_production_settings()
-    return settings
+    return SETTINGS
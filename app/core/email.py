@@ -3,6 +3,8 @@ Email Service - Brevo Transactional Email API
 CRITICAL: Uses BREVO_API_KEY from environment; no keys are hardcoded
 """
 import logging
+import string
+import threading
 from typing import Optional
 
 import httpx
@@ -12,6 +14,84 @@ from app.core.config import get_settings
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# Email bodies are parsed once at import; sends only substitute values
+_VERIFICATION_TPL = string.Template("""\
+<!DOCTYPE html>
+<html>
+<body style="font-family: sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+    <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 30px; text-align: center; border-radius: 10px 10px 0 0;">
+        <h1 style="color: white; margin: 0;">🛡️ SyncVeil</h1>
+    </div>
+    <div style="background: white; padding: 40px; border: 1px solid #e2e8f0;">
+        <h2>Verify your email</h2>
+        <p>Use the one-time code below to verify your account.</p>
+        <div style="text-align: center; margin: 30px 0;">
+            <span style="font-size: 36px; font-weight: bold; letter-spacing: 8px; color: #667eea;">$otp_code</span>
+        </div>
+        <p style="color: #e53e3e; font-size: 14px;">This code expires in $expire_minutes minutes.</p>
+        <p style="color: #718096; font-size: 14px;">You can also verify by opening this link: $verification_url</p>
+        <p style="color: #a0aec0; font-size: 12px;">Never share this code. If you didn't request it, ignore this email.</p>
+    </div>
+</body>
+</html>
+""")
+
+_OTP_TPL = string.Template("""\
+<!DOCTYPE html>
+<html>
+<body style="font-family: sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+    <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 30px; text-align: center; border-radius: 10px 10px 0 0;">
+        <h1 style="color: white; margin: 0;">🛡️ SyncVeil</h1>
+    </div>
+    <div style="background: white; padding: 40px; border: 1px solid #e2e8f0;">
+        <h2>Your Login Code</h2>
+        <p>Enter this code to complete your login:</p>
+        <div style="text-align: center; margin: 30px 0;">
+            <span style="font-size: 36px; font-weight: bold; letter-spacing: 8px; color: #667eea;">$otp_code</span>
+        </div>
+        <p style="color: #e53e3e; font-size: 14px;">This code expires in $expire_minutes minutes.</p>
+        <p style="color: #a0aec0; font-size: 12px;">Never share this code with anyone.</p>
+    </div>
+</body>
+</html>
+""")
+
+_NEW_DEVICE_TPL = string.Template("""\
+<!DOCTYPE html>
+<html>
+<body style="font-family: sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+    <div style="background: #f59e0b; padding: 30px; text-align: center; border-radius: 10px 10px 0 0;">
+        <h1 style="color: white; margin: 0;">🔔 Security Alert</h1>
+    </div>
+    <div style="background: white; padding: 40px; border: 1px solid #e2e8f0;">
+        <h2>New Device Login</h2>
+        <p>Your account was accessed from a new device:</p>
+        <div style="background: #fef3c7; padding: 16px; margin: 24px 0;">
+            <p><strong>Device:</strong> $device_info</p>
+            <p><strong>IP:</strong> $ip_address</p>
+        </div>
+        <p style="color: #dc2626;">If this wasn't you, change your password immediately.</p>
+    </div>
+</body>
+</html>
+""")
+
+_PASSWORD_CHANGED_HTML = """\
+<!DOCTYPE html>
+<html>
+<body style="font-family: sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+    <div style="background: #10b981; padding: 30px; text-align: center; border-radius: 10px 10px 0 0;">
+        <h1 style="color: white; margin: 0;">🛡️ Password Changed</h1>
+    </div>
+    <div style="background: white; padding: 40px; border: 1px solid #e2e8f0;">
+        <h2>Password Changed Successfully</h2>
+        <p>Your SyncVeil password was changed.</p>
+        <p style="color: #dc2626;">If you didn't make this change, contact support immediately.</p>
+    </div>
+</body>
+</html>
+"""
+
 
 class EmailService:
     """Production email service using Brevo Transactional Email API"""
@@ -21,6 +101,12 @@ class EmailService:
         self.sender_email = settings.SMTP_FROM
         self.sender_name = settings.EMAIL_FROM_NAME
         self._validate_config()
+        # One pooled client for the process lifetime: reuses TLS sessions to api.brevo.com
+        self._client = httpx.Client(
+            http2=True,
+            timeout=10,
+            limits=httpx.Limits(max_keepalive_connections=10, keepalive_expiry=60),
+        )
 
     def _validate_config(self) -> None:
         missing = []
@@ -46,8 +132,7 @@ class EmailService:
         }
 
         try:
-            with httpx.Client(timeout=10) as client:
-                response = client.post("https://api.brevo.com/v3/smtp/email", json=payload, headers=headers)
+            response = self._client.post("https://api.brevo.com/v3/smtp/email", json=payload, headers=headers)
             if 200 <= response.status_code < 300:
                 logger.info(f"Email sent successfully to {to_email}: {subject}")
                 return True
@@ -58,103 +143,56 @@ class EmailService:
             logger.error(f"Email send error to {to_email}: {exc}")
             raise
 
+    def close(self) -> None:
+        """Close pooled connections to Brevo"""
+        self._client.close()
+
     def send_verification_email(self, to_email: str, otp_code: str) -> bool:
         """Send email verification OTP with a short-lived numeric code"""
         verification_url = f"{settings.FRONTEND_URL}/verify-email?token={otp_code}"
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <body style="font-family: sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-            <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 30px; text-align: center; border-radius: 10px 10px 0 0;">
-                <h1 style="color: white; margin: 0;">🛡️ SyncVeil</h1>
-            </div>
-            <div style="background: white; padding: 40px; border: 1px solid #e2e8f0;">
-                <h2>Verify your email</h2>
-                <p>Use the one-time code below to verify your account.</p>
-                <div style="text-align: center; margin: 30px 0;">
-                    <span style="font-size: 36px; font-weight: bold; letter-spacing: 8px; color: #667eea;">{otp_code}</span>
-                </div>
-                <p style="color: #e53e3e; font-size: 14px;">This code expires in {settings.OTP_EXPIRE_MINUTES} minutes.</p>
-                <p style="color: #718096; font-size: 14px;">You can also verify by opening this link: {verification_url}</p>
-                <p style="color: #a0aec0; font-size: 12px;">Never share this code. If you didn't request it, ignore this email.</p>
-            </div>
-        </body>
-        </html>
-        """
+        html_content = _VERIFICATION_TPL.substitute(
+            otp_code=otp_code,
+            verification_url=verification_url,
+            expire_minutes=settings.OTP_EXPIRE_MINUTES,
+        )
         return self._send(to_email, "Verify your SyncVeil account", html_content)
 
     def send_otp_email(self, to_email: str, otp_code: str) -> bool:
         """Send OTP code for login verification"""
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <body style="font-family: sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-            <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 30px; text-align: center; border-radius: 10px 10px 0 0;">
-                <h1 style="color: white; margin: 0;">🛡️ SyncVeil</h1>
-            </div>
-            <div style="background: white; padding: 40px; border: 1px solid #e2e8f0;">
-                <h2>Your Login Code</h2>
-                <p>Enter this code to complete your login:</p>
-                <div style="text-align: center; margin: 30px 0;">
-                    <span style="font-size: 36px; font-weight: bold; letter-spacing: 8px; color: #667eea;">{otp_code}</span>
-                </div>
-                <p style="color: #e53e3e; font-size: 14px;">This code expires in {settings.OTP_EXPIRE_MINUTES} minutes.</p>
-                <p style="color: #a0aec0; font-size: 12px;">Never share this code with anyone.</p>
-            </div>
-        </body>
-        </html>
-        """
+        html_content = _OTP_TPL.substitute(otp_code=otp_code, expire_minutes=settings.OTP_EXPIRE_MINUTES)
         return self._send(to_email, f"Your SyncVeil login code: {otp_code}", html_content)
 
     def send_new_device_alert(self, to_email: str, device_info: str, ip_address: str) -> bool:
         """Send alert for new device login"""
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <body style="font-family: sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-            <div style="background: #f59e0b; padding: 30px; text-align: center; border-radius: 10px 10px 0 0;">
-                <h1 style="color: white; margin: 0;">🔔 Security Alert</h1>
-            </div>
-            <div style="background: white; padding: 40px; border: 1px solid #e2e8f0;">
-                <h2>New Device Login</h2>
-                <p>Your account was accessed from a new device:</p>
-                <div style="background: #fef3c7; padding: 16px; margin: 24px 0;">
-                    <p><strong>Device:</strong> {device_info}</p>
-                    <p><strong>IP:</strong> {ip_address}</p>
-                </div>
-                <p style="color: #dc2626;">If this wasn't you, change your password immediately.</p>
-            </div>
-        </body>
-        </html>
-        """
+        html_content = _NEW_DEVICE_TPL.substitute(device_info=device_info, ip_address=ip_address)
         return self._send(to_email, "🔔 New device login", html_content)
 
     def send_password_change_alert(self, to_email: str) -> bool:
         """Send alert after password change"""
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <body style="font-family: sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-            <div style="background: #10b981; padding: 30px; text-align: center; border-radius: 10px 10px 0 0;">
-                <h1 style="color: white; margin: 0;">🛡️ Password Changed</h1>
-            </div>
-            <div style="background: white; padding: 40px; border: 1px solid #e2e8f0;">
-                <h2>Password Changed Successfully</h2>
-                <p>Your SyncVeil password was changed.</p>
-                <p style="color: #dc2626;">If you didn't make this change, contact support immediately.</p>
-            </div>
-        </body>
-        </html>
-        """
-        return self._send(to_email, "Password changed", html_content)
+        return self._send(to_email, "Password changed", _PASSWORD_CHANGED_HTML)
 
 
 _email_service: Optional[EmailService] = None
+# Sends run on threadpool threads; serializes the lazy init so only one pooled client is built
+_email_service_lock = threading.Lock()
 
 
 def get_email_service() -> EmailService:
     """Get or create email service singleton"""
     global _email_service
-    if _email_service is None:
-        _email_service = EmailService()
-    return _email_service
\ No newline at end of file
+    if _email_service is not None:
+        return _email_service
+
+    with _email_service_lock:
+        if _email_service is None:
+            _email_service = EmailService()
+        return _email_service
+
+
+def close_email_service() -> None:
+    """Close the email service singleton's HTTP client, if one was created"""
+    global _email_service
+    with _email_service_lock:
+        if _email_service is not None:
+            _email_service.close()
+            _email_service = None
\ No newline at end of file
@@ -0,0 +1,26 @@
+"""
+Token hashing - SHA-256 digests for refresh tokens, OTP codes and session tokens
+hashlib is backed by OpenSSL, which selects its SHA-NI kernel (sha256_block_data_order_shaext) at runtime
+"""
+import hashlib
+from typing import Iterable, List
+
+_sha256 = hashlib.sha256
+
+
+def hash_token(token: str) -> str:
+    """
+    Hash a token for secure storage using SHA-256.
+    Used for refresh tokens, OTP codes, and session tokens.
+    We hash these so if the database is compromised, tokens can't be used directly.
+    """
+    return _sha256(token.encode()).hexdigest()
+
+
+def hash_tokens(tokens: Iterable[str]) -> List[str]:
+    """
+    Hash many tokens in one call (cleanup jobs, bulk revocation).
+    Same digests as hash_token, without per-token function call and global lookups.
+    """
+    sha256 = _sha256
+    return [sha256(token.encode()).hexdigest() for token in tokens]
@@ -1,74 +1,285 @@
 """
 Security utilities - Password hashing, token generation, OTP
 CRITICAL: Uses Argon2 for password hashing (industry standard, more secure than PBKDF2)
+Argon2id is provided by libsodium (via PyNaCl), which dispatches to its AVX2/AVX-512 kernels at runtime
+bcrypt can be selected instead (PASSWORD_HASH_SCHEME) where per-verify memory matters more than latency
 """
-import hashlib
+import asyncio
+import base64
+import hmac
+import logging
+import multiprocessing
+import os
 import secrets
-import string
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 
+from cachetools import TTLCache
 from fastapi import HTTPException, status
-from argon2 import PasswordHasher
-from argon2.exceptions import VerifyMismatchError
+# Pure Python; libsodium itself is only loaded by _get_pwhash()
+from nacl.exceptions import InvalidkeyError
 
 from app.core.config import get_settings
+from app.core.hashing import hash_token, hash_tokens  # noqa: F401 (re-exported)
 from app.core.jwt import decode_access_token
 
+# Optional: fastpbkdf2 is a drop-in pbkdf2_hmac with a faster inner loop for legacy hashes
+try:
+    from fastpbkdf2 import pbkdf2_hmac
+except ImportError:
+    from hashlib import pbkdf2_hmac
+
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
-# Initialize Argon2 password hasher with production-grade settings
-ph = PasswordHasher(
-    time_cost=settings.PASSWORD_HASH_TIME_COST,
-    memory_cost=settings.PASSWORD_HASH_MEMORY_COST,
-    parallelism=settings.PASSWORD_HASH_PARALLELISM,
-)
+# Scheme new hashes are written in
+PASSWORD_HASH_SCHEME = settings.PASSWORD_HASH_SCHEME
+BCRYPT_ROUNDS = settings.PASSWORD_HASH_BCRYPT_ROUNDS
+# Like legacy PBKDF2, bcrypt verification is decided per deployment, never per stored hash
+BCRYPT_ENABLED = PASSWORD_HASH_SCHEME == "bcrypt" or settings.PASSWORD_HASH_VERIFY_BCRYPT
+# bcrypt only reads the first 72 bytes; longer passwords are rejected instead of truncated
+BCRYPT_MAX_PASSWORD_BYTES = 72
+
+# Argon2id cost parameters with production-grade settings
+# libsodium takes memory in bytes (settings are KiB) and always hashes with parallelism=1
+ARGON2_OPSLIMIT = settings.PASSWORD_HASH_TIME_COST
+ARGON2_MEMLIMIT = settings.PASSWORD_HASH_MEMORY_COST * 1024
+
+# Legacy PBKDF2 verification is a deployment-wide switch, so all users share one timing profile
+LEGACY_PBKDF2_ENABLED = settings.LEGACY_PBKDF2_ENABLED
+LEGACY_PBKDF2_ITERATIONS = settings.LEGACY_PBKDF2_ITERATIONS
+
+# Argon2 runs in worker processes so concurrent logins use separate cores and the
+# event loop stays responsive; one core is left for the loop itself
+_ARGON2_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+# Created on first use so a forking server (uvicorn --workers) never shares one pool
+_ARGON2_POOL: Optional[ProcessPoolExecutor] = None
+# Workers are not forked from the app: by first use it runs threads (log listener,
+# threadpool) whose held locks a forked child would inherit. forkserver children
+# start from a clean single-threaded server; spawn covers platforms without it.
+_ARGON2_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+# Caps in-flight hashes so a login flood cannot pile up memory_cost-sized jobs
+_ARGON2_SEM = asyncio.Semaphore(_ARGON2_WORKERS)
+
+# Successful verifications are remembered for a few seconds so bursts of re-logins
+# (SPA reloads) skip Argon2. Keyed by (stored hash, keyed BLAKE2b of the password):
+# plaintext is never stored and the per-process key never leaves memory.
+_VERIFY_CACHE_SECRET = secrets.token_bytes(32)
+_VERIFY_CACHE: TTLCache = TTLCache(maxsize=4096, ttl=5)
+
+# Hashing backends load on first use, so cold starts (and processes that never
+# hash a password) skip the libsodium/bcrypt shared-library loads
+_pwhash = None
+_bcrypt = None
+_BCRYPT_ALPHABET = "./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+_DUMMY_BCRYPT_HASH: Optional[str] = None
+
+
+def _get_pwhash():
+    global _pwhash
+    if _pwhash is None:
+        from nacl import pwhash
+        _pwhash = pwhash
+    return _pwhash
+
+
+def _get_bcrypt():
+    global _bcrypt, _DUMMY_BCRYPT_HASH
+    if _bcrypt is None:
+        import bcrypt
+        # gensalt only draws random bytes; the 31-char checksum is random, never a real hash
+        _DUMMY_BCRYPT_HASH = (
+            bcrypt.gensalt(rounds=BCRYPT_ROUNDS).decode("ascii")
+            + "".join(secrets.choice(_BCRYPT_ALPHABET) for _ in range(31))
+        )
+        _bcrypt = bcrypt
+    return _bcrypt
 
 
 def hash_password(password: str) -> str:
     """
-    Hash a password using Argon2.
+    Hash a password using the configured scheme (Argon2 by default).
     NEVER store plain passwords in the database.
     """
-    return ph.hash(password)
+    if PASSWORD_HASH_SCHEME == "bcrypt":
+        raw = password.encode()
+        if len(raw) > BCRYPT_MAX_PASSWORD_BYTES:
+            raise ValueError(f"bcrypt passwords are limited to {BCRYPT_MAX_PASSWORD_BYTES} bytes")
+        bcrypt = _get_bcrypt()
+        return bcrypt.hashpw(raw, bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode("ascii")
+    return _get_pwhash().argon2id.str(
+        password.encode(), opslimit=ARGON2_OPSLIMIT, memlimit=ARGON2_MEMLIMIT
+    ).decode("ascii")
+
+
+def password_exceeds_scheme_limit(password: str) -> bool:
+    """True when the configured scheme cannot hash all of the password (bcrypt's 72 bytes)"""
+    return PASSWORD_HASH_SCHEME == "bcrypt" and len(password.encode()) > BCRYPT_MAX_PASSWORD_BYTES
+
+
+def _decode_bytes(raw: str) -> bytes:
+    """Decode unpadded urlsafe base64 (legacy PBKDF2 salt/digest fields)"""
+    padding = '=' * (-len(raw) % 4)
+    return base64.urlsafe_b64decode(raw + padding)
+
+
+def parse_pbkdf2_hash(hashed_password: str) -> Tuple[str, int, bytes, bytes]:
+    """
+    Split a legacy 'pbkdf2:<algo>:<iterations>$<salt>$<digest>' hash into
+    (algo, iterations, salt, digest). Raises ValueError if malformed.
+    """
+    scheme, salt_b64, digest_b64 = hashed_password.split("$")
+    _, algo, iter_str = scheme.split(":")
+    return algo, int(iter_str), _decode_bytes(salt_b64), _decode_bytes(digest_b64)
+
+
+def verify_pbkdf2(plain_password: str, algo: str, iterations: int, salt: bytes, expected: bytes) -> bool:
+    """Check a password against pre-parsed legacy PBKDF2 parameters"""
+    derived = pbkdf2_hmac(algo, plain_password.encode(), salt, iterations, dklen=len(expected))
+    return hmac.compare_digest(derived, expected)
+
+
+def _b64(raw: bytes) -> str:
+    """Unpadded standard base64, as used in PHC-style $argon2 strings"""
+    return base64.b64encode(raw).decode("ascii").rstrip("=")
+
+
+# Well-formed hashes of nothing: random salt and tag, so they cost a full verify and never match.
+# verify_password runs the scheme a hash does not use against these, and login_user uses
+# DUMMY_PASSWORD_HASH for unknown emails.
+DUMMY_PASSWORD_HASH = (
+    f"$argon2id$v=19$m={ARGON2_MEMLIMIT // 1024},t={ARGON2_OPSLIMIT},p=1"
+    f"${_b64(secrets.token_bytes(16))}${_b64(secrets.token_bytes(32))}"
+)
+_DUMMY_PBKDF2_HASH = (
+    f"pbkdf2:sha256:{LEGACY_PBKDF2_ITERATIONS}"
+    f"${base64.urlsafe_b64encode(secrets.token_bytes(16)).decode('ascii').rstrip('=')}"
+    f"${base64.urlsafe_b64encode(secrets.token_bytes(32)).decode('ascii').rstrip('=')}"
+)
+
+
+def _try_argon2(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return _get_pwhash().verify(hashed_password.encode(), plain_password.encode())
+    except InvalidkeyError:
+        return False
+
+
+def _try_pbkdf2(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return verify_pbkdf2(plain_password, *parse_pbkdf2_hash(hashed_password))
+    except Exception:
+        return False
+
+
+def _try_bcrypt(plain_password: str, hashed_password: str) -> bool:
+    raw = plain_password.encode()
+    try:
+        # Over-long passwords still pay for a full check but never match, so a password
+        # cannot be satisfied by anything sharing its first 72 bytes
+        matched = _get_bcrypt().checkpw(raw[:BCRYPT_MAX_PASSWORD_BYTES], hashed_password.encode())
+    except ValueError:
+        return False
+    return matched & (len(raw) <= BCRYPT_MAX_PASSWORD_BYTES)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verify a password against its hash.
     Returns True if password matches, False otherwise.
-    Supports both Argon2 (new) and legacy PBKDF2 (for migration).
+    Supports Argon2 (new), bcrypt (when BCRYPT_ENABLED) and legacy PBKDF2 (for migration,
+    when LEGACY_PBKDF2_ENABLED). Every enabled scheme runs (the unused ones against dummy
+    hashes), so response time does not reveal which scheme a user's hash is stored in.
     """
-    # Check if it's an Argon2 hash
-    if hashed_password.startswith('$argon2'):
-        try:
-            ph.verify(hashed_password, plain_password)
-            return True
-        except VerifyMismatchError:
-            return False
-    
+    prefix = hashed_password[:7].encode()
+    is_argon2 = hmac.compare_digest(prefix, b'$argon2')
     # Legacy PBKDF2 support (for existing users during migration)
-    if hashed_password.startswith('pbkdf2:'):
+    is_pbkdf2 = hmac.compare_digest(prefix, b'pbkdf2:')
+    bcrypt_prefix = prefix[:4]
+    is_bcrypt = (
+        hmac.compare_digest(bcrypt_prefix, b'$2b$')
+        | hmac.compare_digest(bcrypt_prefix, b'$2a$')
+        | hmac.compare_digest(bcrypt_prefix, b'$2y$')
+    )
+
+    argon2_ok = _try_argon2(plain_password, hashed_password if is_argon2 else DUMMY_PASSWORD_HASH)
+    verified = argon2_ok & is_argon2
+    if LEGACY_PBKDF2_ENABLED:
+        pbkdf2_ok = _try_pbkdf2(plain_password, hashed_password if is_pbkdf2 else _DUMMY_PBKDF2_HASH)
+        verified |= pbkdf2_ok & is_pbkdf2
+    elif is_pbkdf2:
+        # Otherwise indistinguishable from a wrong password in the logs
+        logger.warning("Rejected a legacy PBKDF2 hash because LEGACY_PBKDF2_ENABLED is off")
+    if BCRYPT_ENABLED:
+        _get_bcrypt()  # also builds _DUMMY_BCRYPT_HASH
+        bcrypt_ok = _try_bcrypt(plain_password, hashed_password if is_bcrypt else _DUMMY_BCRYPT_HASH)
+        verified |= bcrypt_ok & is_bcrypt
+    return verified
+
+
+def _get_argon2_pool() -> ProcessPoolExecutor:
+    global _ARGON2_POOL
+    if _ARGON2_POOL is None:
+        _ARGON2_POOL = ProcessPoolExecutor(
+            max_workers=_ARGON2_WORKERS,
+            mp_context=multiprocessing.get_context(_ARGON2_START_METHOD),
+        )
+    return _ARGON2_POOL
+
+
+def _discard_argon2_pool(pool: ProcessPoolExecutor) -> None:
+    global _ARGON2_POOL
+    # Concurrent callers may all see the same broken pool; only the first replaces it
+    if _ARGON2_POOL is pool:
+        _ARGON2_POOL = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def _run_in_argon2_pool(fn, *args):
+    async with _ARGON2_SEM:
+        loop = asyncio.get_running_loop()
+        pool = _get_argon2_pool()
         try:
-            scheme, salt_b64, digest_b64 = hashed_password.split("$")
-            _, algo, iter_str = scheme.split(":")
-            iterations = int(iter_str)
-            
-            import base64
-            def _decode_bytes(raw: str) -> bytes:
-                padding = '=' * (-len(raw) % 4)
-                return base64.urlsafe_b64decode(raw + padding)
-            
-            salt = _decode_bytes(salt_b64)
-            expected = _decode_bytes(digest_b64)
-            derived = hashlib.pbkdf2_hmac(algo, plain_password.encode(), salt, iterations, dklen=len(expected))
-            
-            import hmac
-            return hmac.compare_digest(derived, expected)
-        except Exception:
-            return False
-    
-    return False
+            return await loop.run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed mid-hash); the executor is unusable from here on
+            logger.exception("Argon2 worker pool broke; starting a new one")
+            _discard_argon2_pool(pool)
+            return await loop.run_in_executor(_get_argon2_pool(), fn, *args)
+
+
+async def ahash_password(password: str) -> str:
+    """
+    Hash a password without blocking the event loop.
+    Use this from async request handlers instead of hash_password.
+    """
+    return await _run_in_argon2_pool(hash_password, password)
+
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a password without blocking the event loop.
+    Use this from async request handlers instead of verify_password.
+    """
+    # A password change stores a new hash, so stale entries can never match
+    cache_key = (hashed_password, hmac.digest(_VERIFY_CACHE_SECRET, plain_password.encode(), "blake2b"))
+    if cache_key in _VERIFY_CACHE:
+        return True
+    verified = await _run_in_argon2_pool(verify_password, plain_password, hashed_password)
+    if verified:
+        _VERIFY_CACHE[cache_key] = True
+    return verified
+
+
+def shutdown_password_pool() -> None:
+    """Stop the password hashing worker processes (called on app shutdown)"""
+    global _ARGON2_POOL
+    if _ARGON2_POOL is not None:
+        _ARGON2_POOL.shutdown(cancel_futures=True)
+        _ARGON2_POOL = None
 
 
 def generate_secure_token(length: int = 32) -> str:
@@ -83,24 +294,24 @@ def generate_otp(length: int = 6) -> str:
     """
     Generate a numeric OTP code.
     Used for two-factor authentication via email.
+    Draws one batch of random bytes and keeps those below 250 (= 25 * 10) so b % 10 is unbiased.
     """
-    return ''.join(secrets.choice(string.digits) for _ in range(length))
-
-
-def hash_token(token: str) -> str:
-    """
-    Hash a token for secure storage using SHA-256.
-    Used for refresh tokens, OTP codes, and session tokens.
-    We hash these so if the database is compromised, tokens can't be used directly.
-    """
-    return hashlib.sha256(token.encode()).hexdigest()
+    out = bytearray(length)
+    i = 0
+    while i < length:
+        for b in secrets.token_bytes(length * 2):
+            if b < 250:
+                out[i] = 0x30 + b % 10
+                i += 1
+                if i == length:
+                    break
+    return out.decode('ascii')
 
 
 def verify_token_hash(token: str, token_hash: str) -> bool:
     """
     Verify a token against its hash using constant-time comparison.
     """
-    import hmac
     return hmac.compare_digest(hash_token(token), token_hash)
 
 
@@ -136,4 +347,19 @@ def get_expiry_time(minutes: Optional[int] = None, hours: Optional[int] = None,
     if days:
         delta_kwargs['days'] = days
     
-    return datetime.utcnow() + timedelta(**delta_kwargs)
\ No newline at end of file
+    return datetime.utcnow() + timedelta(**delta_kwargs)
+
+
+def is_token_expired_ns(expires_at_ns: int) -> bool:
+    """
+    Check expiry of a timestamp stored as integer Unix nanoseconds.
+    Avoids building datetime objects on hot token paths.
+    """
+    return time.time_ns() >= expires_at_ns
+
+
+def get_expiry_ns(seconds: int) -> int:
+    """
+    Expiry as integer Unix nanoseconds, `seconds` from now.
+    """
+    return time.time_ns() + seconds * 1_000_000_000
\ No newline at end of file
@@ -3,40 +3,52 @@ Dashboard API Routes
 User dashboard data endpoints
 CRITICAL: All endpoints must validate authentication token
 """
-from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File
-from sqlalchemy.orm import Session
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, status, Depends, Security, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
 from app.core.security import verify_token
-from datetime import datetime
+from datetime import datetime, timezone
 
 router = APIRouter(prefix="/api", tags=["dashboard"])
 
+# Parses "Authorization: Bearer <token>"; returns None instead of raising so we control the 401
+_bearer = HTTPBearer(auto_error=False)
+
+MAX_UPLOAD_BYTES = 100 * 1024 * 1024
+
+
+def _spooled_size(fileobj) -> int:
+    """Size of the upload's spooled temp file, found by seeking instead of reading it"""
+    fileobj.seek(0, 2)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return size
+
 
-def get_current_user(token: str = None, db: Session = Depends(get_db)):
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Security(_bearer),
+    db: AsyncSession = Depends(get_db),
+):
     """Verify authentication token and return user"""
-    if not token:
+    if credentials is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Not authenticated"
         )
     
-    # Token should be passed in Authorization header as "Bearer <token>"
-    # This is a simplified check - implement full JWT verification
-    if not token.startswith("Bearer "):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token format"
-        )
-    
-    # Extract token
-    token = token.split(" ")[1]
+    # HTTPBearer has already checked the "Bearer " scheme and split off the token
+    token = credentials.credentials
     
     # Verify token (implement with your JWT verification logic)
     # For now, this is a placeholder
     try:
         # payload = verify_token(token)
         # user_id = payload.get("sub")
-        # user = db.query(User).filter(User.id == user_id).first()
+        # user = await db.get(User, user_id)
         # if not user:
         #     raise HTTPException(status_code=401, detail="User not found")
         # return user
@@ -74,17 +86,20 @@ async def upload_file(file: UploadFile = File(...)):
             detail="No file provided"
         )
     
-    # Validate file size (example: 100MB max)
-    # content = await file.read()
-    # if len(content) > 100 * 1024 * 1024:
-    #     raise HTTPException(status_code=413, detail="File too large")
+    # Validate file size (100MB max) without loading the file into memory;
+    # the multipart parser records the size, seek/tell is the fallback
+    size = file.size
+    if size is None:
+        size = await run_in_threadpool(_spooled_size, file.file)
+    if size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
     
     # PRODUCTION: Implement actual file storage and encryption
     return {
         "id": "file-id",
         "name": file.filename,
-        "size": 0,
-        "uploaded_at": datetime.utcnow().isoformat(),
+        "size": size,
+        "uploaded_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
         "status": "secured"
     }
 
@@ -106,5 +121,5 @@ async def get_breach_monitor_data():
     """
     return {
         "breaches": [],
-        "lastUpdated": datetime.utcnow().isoformat(),
+        "lastUpdated": datetime.now(timezone.utc).isoformat(timespec='seconds'),
     }
@@ -6,7 +6,7 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Boolean, Column, DateTime, Integer, String, Text, ForeignKey, Index
+from sqlalchemy import Boolean, Column, DateTime, Integer, String, Text, ForeignKey, Index, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -21,7 +21,7 @@ class User(Base):
     __tablename__ = "users"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    email = Column(String(255), unique=True, nullable=False, index=True)
+    email = Column(String(255), unique=True, nullable=False, index=True)  # Stored lowercased
     password_hash = Column(String(255), nullable=False)
     
     # Email verification
@@ -48,6 +48,8 @@ class User(Base):
     __table_args__ = (
         Index('idx_user_email_verified', 'email', 'email_verified'),
         Index('idx_user_disabled', 'disabled'),
+        # Case-insensitive uniqueness only; lookups use the plain email index
+        Index('ix_users_email_lower', func.lower(email), unique=True),
     )
 
 
@@ -1,69 +1,83 @@
 """
 MongoDB Connection Management
-Production-ready MongoDB Atlas connection using Motor (async driver)
+Production-ready MongoDB Atlas connection using PyMongo's native async client
 Requires MONGO_URI environment variable with mongodb+srv:// connection string
 """
 import asyncio
-from typing import Optional
+import logging
+from typing import Awaitable, Callable, Optional, TypeVar
 
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
-from pymongo import MongoClient
+import certifi
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import ServerSelectionTimeoutError
 from fastapi import HTTPException, status
 
 from app.core.config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger("syncveil.mongo")
 
+# Resolved once; the client validates Atlas TLS against certifi's bundle
+_CA_FILE = certifi.where()
 
-class MongoDB:
-    """MongoDB connection manager"""
-    client: Optional[AsyncIOMotorClient] = None
-    db: Optional[AsyncIOMotorDatabase] = None
+_MONGO_URI_PREFIXES = ("mongodb+srv://", "mongodb://")
+
+# Client settings (one pool per process, shared by async and thread callers)
+_MONGO_CLIENT_KWARGS = {
+    "tlsCAFile": _CA_FILE,
+    "serverSelectionTimeoutMS": 5000,
+    "connectTimeoutMS": 10000,
+    "socketTimeoutMS": 10000,
+    "maxPoolSize": 10,
+    "maxIdleTimeMS": 60000,
+}
 
+T = TypeVar("T")
 
-class SyncMongoDB:
-    """Synchronous MongoDB connection manager"""
-    client: Optional[MongoClient] = None
-    db = None
+
+class MongoDB:
+    """MongoDB connection manager"""
+    client: Optional[AsyncMongoClient] = None
+    db: Optional[AsyncDatabase] = None
+    # Event loop the client is bound to; thread callers schedule work onto it
+    loop: Optional[asyncio.AbstractEventLoop] = None
 
 
 mongodb = MongoDB()
-sync_mongodb = SyncMongoDB()
 
 
 def _validate_mongo_uri() -> None:
     """Shared validation for MongoDB configuration"""
-    if not settings.MONGO_URI:
+    uri = settings.MONGO_URI
+    if not uri:
         raise RuntimeError(
             "MONGO_URI environment variable is required for MongoDB connection. "
             "Please set MONGO_URI to your MongoDB Atlas connection string (mongodb+srv://...)"
         )
 
-    if not settings.MONGO_URI.startswith("mongodb+srv://") and not settings.MONGO_URI.startswith("mongodb://"):
+    if not uri.startswith(_MONGO_URI_PREFIXES):
         raise ValueError(
             f"Invalid MONGO_URI format. Expected mongodb+srv:// or mongodb:// connection string, "
-            f"got: {settings.MONGO_URI[:20]}..."
+            f"got: {uri[:20]}..."
         )
 
-    if "localhost" in settings.MONGO_URI or "127.0.0.1" in settings.MONGO_URI:
-        print("⚠️  WARNING: Using localhost MongoDB connection. This will not work on Railway.")
-        print("   Please use MongoDB Atlas (mongodb+srv://) for production deployment.")
+    if "localhost" in uri or "127.0.0.1" in uri:
+        logger.warning(
+            "Using localhost MongoDB connection. This will not work on Railway. "
+            "Please use MongoDB Atlas (mongodb+srv://) for production deployment."
+        )
 
 
 async def connect_to_mongodb():
     """Initialize MongoDB Atlas connection"""
-    import certifi
     _validate_mongo_uri()
     
     try:
         # Create MongoDB client with production-safe settings
-        mongodb.client = AsyncIOMotorClient(
+        mongodb.client = AsyncMongoClient(
             settings.MONGO_URI,
-            tlsCAFile=certifi.where(),  # Use certifi for SSL certificate validation
-            serverSelectionTimeoutMS=5000,
-            connectTimeoutMS=10000,
-            socketTimeoutMS=10000,
-            maxPoolSize=10,
+            **_MONGO_CLIENT_KWARGS,
             minPoolSize=1,
             retryWrites=True,
             w="majority"
@@ -71,20 +85,20 @@ async def connect_to_mongodb():
         
         # Explicitly select database (don't rely on connection string defaults)
         mongodb.db = mongodb.client[settings.MONGO_DB_NAME]
+        mongodb.loop = asyncio.get_running_loop()
         
-        # Test connection with timeout
-        await asyncio.wait_for(
-            mongodb.client.admin.command('ping'),
-            timeout=10.0
+        # Test connection (bounded by serverSelectionTimeoutMS)
+        await mongodb.client.admin.command('ping')
+
+        # Only the host part after '@' is logged; credentials stay out of the logs
+        logger.info(
+            "Connected to MongoDB Atlas db=%s host=%s",
+            settings.MONGO_DB_NAME,
+            settings.MONGO_URI.rpartition("@")[2] if "@" in settings.MONGO_URI else "hidden",
         )
         
-        print(f"✅ Connected to MongoDB Atlas")
-        print(f"   Database: {settings.MONGO_DB_NAME}")
-        print(f"   Connection: {settings.MONGO_URI.split('@')[1] if '@' in settings.MONGO_URI else 'hidden'}")
-        
-    except asyncio.TimeoutError:
-        mongodb.client = None
-        mongodb.db = None
+    except ServerSelectionTimeoutError:
+        await _discard_client()
         raise RuntimeError(
             f"MongoDB connection timeout. Please check:\n"
             f"  1. MONGO_URI is correct\n"
@@ -92,8 +106,7 @@ async def connect_to_mongodb():
             f"  3. Database user credentials are valid"
         )
     except Exception as e:
-        mongodb.client = None
-        mongodb.db = None
+        await _discard_client()
         error_msg = str(e)
         if "authentication failed" in error_msg.lower():
             raise RuntimeError(f"MongoDB authentication failed. Check username/password in MONGO_URI: {error_msg}")
@@ -102,43 +115,71 @@ async def connect_to_mongodb():
         else:
             raise RuntimeError(f"MongoDB connection failed: {error_msg}")
 
+    # Indexes only speed up and tidy OTP queries: a failure here (option conflict, existing
+    # duplicates, no createIndex privilege) is logged and the connection stays up
+    try:
+        await ensure_indexes()
+    except Exception:
+        logger.exception("Failed to ensure MongoDB indexes; continuing without them")
+
+
+async def _discard_client():
+    """Drop a half-initialized client after a failed connect, closing its pool"""
+    client = mongodb.client
+    mongodb.client = None
+    mongodb.db = None
+    mongodb.loop = None
+    if client is not None:
+        try:
+            await client.close()
+        except Exception:
+            pass
+
+
+async def ensure_indexes():
+    """Create the indexes backing hot auth queries (idempotent)"""
+    otps = mongodb.db.email_otps
+    # verify_email: lookup by OTP hash
+    await otps.create_index([("otp_hash", 1), ("purpose", 1)])
+    # At most one unused OTP per user/purpose; also backs the re-issue upsert
+    await otps.create_index(
+        [("user_id", 1), ("purpose", 1)],
+        unique=True,
+        partialFilterExpression={"used": False},
+    )
+    # TTL: MongoDB evicts OTPs once expires_at has passed
+    await otps.create_index("expires_at", expireAfterSeconds=0)
+
 
 async def close_mongodb_connection():
     """Close MongoDB connection"""
     if mongodb.client:
-        mongodb.client.close()
-        print("✅ MongoDB connection closed")
-
-
-def get_sync_mongodb():
-    """Get synchronous MongoDB database instance (for thread-based code paths)"""
-    import certifi
-
-    if sync_mongodb.db is not None:
-        return sync_mongodb.db
+        await mongodb.client.close()
+        mongodb.client = None
+        mongodb.db = None
+        mongodb.loop = None
+        logger.info("MongoDB connection closed")
 
-    _validate_mongo_uri()
 
+def run_mongodb_sync(operation: Callable[[AsyncDatabase], Awaitable[T]], timeout: float = 10.0) -> T:
+    """
+    Run a MongoDB operation from thread-based code paths, e.g.
+    run_mongodb_sync(lambda db: db.users.find_one({"email": email})).
+    The operation runs on the app's event loop with the shared client, so worker
+    threads reuse its connection pool instead of opening a second one.
+    """
+    if mongodb.db is None or mongodb.loop is None:
+        raise RuntimeError("MongoDB is not connected")
     try:
-        sync_mongodb.client = MongoClient(
-            settings.MONGO_URI,
-            tlsCAFile=certifi.where(),
-            serverSelectionTimeoutMS=5000,
-            connectTimeoutMS=10000,
-            socketTimeoutMS=10000,
-            maxPoolSize=10,
-        )
-        sync_mongodb.db = sync_mongodb.client[settings.MONGO_DB_NAME]
-        sync_mongodb.client.admin.command("ping")
-        print(f"✅ Connected to MongoDB Atlas (sync client) for DB: {settings.MONGO_DB_NAME}")
-        return sync_mongodb.db
-    except Exception as exc:
-        sync_mongodb.client = None
-        sync_mongodb.db = None
-        raise RuntimeError(f"MongoDB connection failed: {exc}")
+        on_loop = asyncio.get_running_loop() is mongodb.loop
+    except RuntimeError:
+        on_loop = False
+    if on_loop:
+        raise RuntimeError("run_mongodb_sync() would block the event loop; await the operation instead")
+    return asyncio.run_coroutine_threadsafe(operation(mongodb.db), mongodb.loop).result(timeout)
 
 
-def get_mongodb() -> AsyncIOMotorDatabase:
+def get_mongodb() -> AsyncDatabase:
     """
     Get MongoDB database instance
     Raises RuntimeError if MongoDB is not connected
@@ -5,7 +5,7 @@ Production deployment on Railway uses MongoDB only. SQL connections are
 intentionally disabled unless explicitly configured for non-production use.
 """
 import os
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from fastapi import HTTPException, status
 
 from app.core.config import get_settings
@@ -15,29 +15,46 @@ settings = get_settings()
 # Detect optional SQL usage (development only)
 database_url = os.getenv("DATABASE_URL", "").strip()
 
+# Async drivers used in place of the sync DBAPIs named in DATABASE_URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def _to_async_url(url: str) -> str:
+    """Rewrite a sync DATABASE_URL (sqlite://, postgresql://) to its async driver"""
+    scheme, sep, rest = url.partition("://")
+    backend = scheme.split("+", 1)[0]
+    if not sep or backend not in ASYNC_DRIVERS:
+        return url
+    return f"{ASYNC_DRIVERS[backend]}://{rest}"
+
+
 # Default: SQL disabled; SessionLocal is unbound to avoid engine creation
 engine = None
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False)
+SessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 if database_url and not settings.is_production:
-    from sqlalchemy import create_engine, event
-    from sqlalchemy.pool import NullPool
+    from sqlalchemy import event
+    from sqlalchemy.ext.asyncio import create_async_engine
 
     # Minimal engine configuration for development/debugging
-    connect_args = {"check_same_thread": False} if database_url.startswith("sqlite") else {}
-    engine_kwargs = {"connect_args": connect_args, "echo": False}
+    engine_kwargs = {"echo": False}
     if not database_url.startswith("sqlite"):
         engine_kwargs.update({
-            "poolclass": NullPool,
+            "pool_size": 20,
+            "max_overflow": 10,
             "pool_pre_ping": True,
         })
 
-    engine = create_engine(database_url, **engine_kwargs)
+    engine = create_async_engine(_to_async_url(database_url), **engine_kwargs)
 
-    @event.listens_for(engine, "connect")
+    @event.listens_for(engine.sync_engine, "connect")
     def receive_connect(dbapi_conn, connection_record):
         """Configure PostgreSQL connections for dev convenience"""
-        if database_url.startswith("postgresql"):
+        if database_url.startswith("postgres"):
             cursor = dbapi_conn.cursor()
             cursor.execute("SET timezone = 'UTC'")
             cursor.close()
@@ -45,15 +62,12 @@ if database_url and not settings.is_production:
     SessionLocal.configure(bind=engine)
 
 
-def get_db():
+async def get_db():
     """Dependency for getting database session; disabled when SQL is not configured"""
     if engine is None:
         raise HTTPException(
             status_code=status.HTTP_501_NOT_IMPLEMENTED,
             detail="SQL database is disabled for this deployment.",
         )
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
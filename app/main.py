@@ -1,32 +1,70 @@
 import os
 import asyncio
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 
-from app.auth import models  # noqa: F401 (ensure models are registered)
 from app.auth.routes import router as auth_router
 from app.dashboard_routes import router as dashboard_router
 from app.mongodb.routes import router as mongodb_router
 from app.db.mongodb import connect_to_mongodb, close_mongodb_connection
 from app.core.config import get_settings
+from app.core.email import close_email_service
+from app.core.security import shutdown_password_pool
 
 
 # ==========================
 # LIFESPAN (Startup / Shutdown)
 # ==========================
+def _start_log_listener(level: str) -> QueueListener:
+    """
+    Route app logging through a queue: request paths only enqueue records and a
+    background thread does the (possibly blocking) stdout writes.
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    root = logging.getLogger()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level.upper())
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def _stop_log_listener(listener: QueueListener) -> None:
+    """Flush queued records and detach the queue handler"""
+    listener.stop()
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, QueueHandler) and h.queue is listener.queue]:
+        root.removeHandler(handler)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Validate configuration (production-safe)
     settings = get_settings()
+    log_listener = _start_log_listener(settings.LOG_LEVEL)
 
-    # MongoDB connection (non-blocking)
+    # MongoDB connection (awaited, so readiness is known before serving traffic;
+    # bounded to stay inside Railway's 10s liveness window)
     if settings.MONGO_URI:
         print("🔌 Attempting MongoDB Atlas connection...")
-        asyncio.create_task(try_connect_mongodb())
+        try:
+            await asyncio.wait_for(try_connect_mongodb(), timeout=8)
+        except asyncio.TimeoutError:
+            await close_mongodb_connection()
+            print("⚠️  MongoDB connection timed out")
+            print("   App will continue without MongoDB endpoints")
     else:
         if settings.is_production:
             raise RuntimeError("MONGO_URI is required in production")
@@ -39,6 +77,9 @@ async def lifespan(app: FastAPI):
         await close_mongodb_connection()
     except Exception:
         pass
+    close_email_service()
+    shutdown_password_pool()
+    _stop_log_listener(log_listener)
 
 
 async def try_connect_mongodb():
@@ -55,17 +96,21 @@ async def try_connect_mongodb():
 app = FastAPI(
     title="SyncVeil Backend",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 
 # ==========================
 # CORS
 # ==========================
-allowed_origins = os.getenv("CORS_ORIGINS", "*").split(",")
+# Starlette checks `origin in allow_origins` per request, so a frozenset makes that O(1)
+allowed_origins = frozenset(
+    o.strip() for o in os.getenv("CORS_ORIGINS", "*").split(",") if o.strip()
+)
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[o.strip() for o in allowed_origins if o.strip()],
+    allow_origins=allowed_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
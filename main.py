@@ -1,4 +1,5 @@
 import os
+import sys
 
 from app.main import app
 
@@ -8,4 +9,11 @@ if __name__ == "__main__":
     uvicorn_port = int(os.getenv("PORT", "8000"))
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=uvicorn_port)
+    # uvloop/httptools come with uvicorn[standard]; uvloop has no Windows build
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=uvicorn_port,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+    )
@@ -0,0 +1,25 @@
+"""Unique index on lower(email) for case-insensitive user lookups
+
+Revision ID: 002_users_email_lower_index
+Revises: 001_initial_schema
+Create Date: 2026-10-14 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002_users_email_lower_index'
+down_revision = '001_initial_schema'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Emails are normalized at write time; bring existing rows in line first
+    op.execute("UPDATE users SET email = lower(email) WHERE email <> lower(email)")
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_email_lower', table_name='users')